@@ -1,6 +1,7 @@
 import platform
 import subprocess
-from typing import Union
+from functools import lru_cache
+from typing import Tuple, Union
 from reportlab.pdfgen import canvas
 from math import cos, sin, pi
 import numpy as np
@@ -11,18 +12,44 @@ from app.options import (
     InsertOptions,
 )
 
-from app.utils import draw_centered_image, change_base, fit_image
+from app.utils import draw_centered_image, change_base, fit_image, is_chinese
 
+from reportlab import rl_config
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from matplotlib import font_manager
 
+# Reportlab validates every attribute assignment on every canvas object when
+# shape checking is on; our inputs are validated upstream, so skip it. The
+# saving scales with the number of draw calls, i.e. with grid density.
+rl_config.shapeChecking = 0
+
+_PLATFORM = platform.system()
+
+# Rotation matrices only depend on the angle, which is constant across a batch
+# run. Cache them (already transposed, since change_base needs the inverse) to
+# avoid recomputing trig for every page. The matrix is kept as a flat tuple of
+# Python floats (xx, xy, yx, yy): rotating one point is four multiplies, and
+# numpy dispatch would cost more than the arithmetic.
+_ROTATION_CACHE = {}
+
+
+def get_rotation_matrix(angle: float) -> Tuple[float, float, float, float]:
+    rotation_matrix = _ROTATION_CACHE.get(angle)
+    if rotation_matrix is None:
+        rotation_angle_rad = angle * pi / 180
+        cos_angle = cos(rotation_angle_rad)
+        sin_angle = sin(rotation_angle_rad)
+        rotation_matrix = (cos_angle, sin_angle, -sin_angle, cos_angle)
+        _ROTATION_CACHE[angle] = rotation_matrix
+    return rotation_matrix
+
 
 def draw_one_watermark(
     watermark: canvas.Canvas,
     x: float,
     y: float,
-    rotation_matrix: np.ndarray,
+    rotation_matrix: Tuple[float, float, float, float],
     drawing_options: DrawingOptions,
     image_width: float,
     image_height: float,
@@ -47,16 +74,50 @@ def draw_one_watermark(
         )
 
 
+@lru_cache(maxsize=8)
+def _insert_geometry(
+    x: float,
+    y: float,
+    horizontal_alignment: str,
+    width: float,
+    height: float,
+):
+    # The box available to the watermark only depends on the insert options
+    # and the page size, both constant across a batch, so cache it
+    max_image_height = min(2 * y * height, 2 * (1 - y) * height)
+
+    if horizontal_alignment == Alignments.LEFT.value:
+        max_image_width = x * width
+        offset_sign = -1
+
+    elif horizontal_alignment == Alignments.RIGHT.value:
+        max_image_width = (1 - x) * width
+        offset_sign = 1
+
+    elif horizontal_alignment == Alignments.CENTER.value:
+        max_image_width = min(2 * (1 - x) * width, 2 * x * width)
+        offset_sign = 0
+
+    else:
+        raise ValueError(f"Invalid alignment value: '{horizontal_alignment}'.")
+
+    return max_image_width, max_image_height, offset_sign
+
+
 def draw_insert_watermark(
     watermark: canvas.Canvas,
     drawing_options: DrawingOptions,
     specific_options: InsertOptions,
     width: float,
     height: float,
-    rotation_matrix: np.ndarray,
+    rotation_matrix: Tuple[float, float, float, float],
 ):
-    max_image_height = min(
-        2 * specific_options.y * height, 2 * (2 * (1 - specific_options.y) * height)
+    max_image_width, max_image_height, offset_sign = _insert_geometry(
+        specific_options.x,
+        specific_options.y,
+        specific_options.horizontal_alignment,
+        width,
+        height,
     )
     image_width, image_height = 0, 0
 
@@ -66,22 +127,6 @@ def draw_insert_watermark(
         )
 
     elif drawing_options.image is not None:
-        if specific_options.horizontal_alignment == Alignments.LEFT.value:
-            max_image_width = specific_options.x * width
-
-        elif specific_options.horizontal_alignment == Alignments.RIGHT.value:
-            max_image_width = (1 - specific_options.x) * width
-
-        elif specific_options.horizontal_alignment == Alignments.CENTER.value:
-            max_image_width = min(
-                2 * (1 - specific_options.x) * width, 2 * specific_options.x * width
-            )
-
-        else:
-            raise ValueError(
-                f"Invalid alignment value: '{specific_options.horizontal_alignment}'."
-            )
-
         # if the image is too big, scale it down to fit in the box
         image_width, image_height = drawing_options.image.getSize()
         image_width, image_height = fit_image(
@@ -97,19 +142,7 @@ def draw_insert_watermark(
     else:
         raise ValueError("No watermark to draw.")
 
-    if specific_options.horizontal_alignment == Alignments.LEFT.value:
-        offset = -watermark_width / 2
-
-    elif specific_options.horizontal_alignment == Alignments.RIGHT.value:
-        offset = watermark_width / 2
-
-    elif specific_options.horizontal_alignment == Alignments.CENTER.value:
-        offset = 0
-
-    else:
-        raise ValueError(
-            f"Invalid alignment value: '{specific_options.horizontal_alignment}'."
-        )
+    offset = offset_sign * watermark_width / 2
 
     draw_one_watermark(
         watermark,
@@ -128,7 +161,7 @@ def draw_grid_watermark(
     specific_options: GridOptions,
     width: float,
     height: float,
-    rotation_matrix: np.ndarray,
+    rotation_matrix: Tuple[float, float, float, float],
 ):
     image_width, image_height = 0, 0
 
@@ -151,96 +184,142 @@ def draw_grid_watermark(
             drawing_options.image_scale,
         )
 
-    for x_index in range(start_index, specific_options.horizontal_boxes + 1):
-        for y_index in range(start_index, specific_options.vertical_boxes + 1):
-            # Coordinates to draw at in original coordinates system
-            x_base = x_index * horizontal_box_spacing
-            y_base = y_index * vertical_box_spacing
-
-            if specific_options.margin:
-                x_base -= horizontal_box_spacing / 2
-                y_base -= vertical_box_spacing / 2
-
-            draw_one_watermark(
-                watermark,
-                x_base,
-                y_base,
-                rotation_matrix,
-                drawing_options,
-                image_width,
-                image_height,
+    # Coordinates to draw at in original coordinates system. Changing the base
+    # of all cell centers in a single matrix product avoids one numpy dispatch
+    # per cell, which dominates for dense grids.
+    xs = np.arange(start_index, specific_options.horizontal_boxes + 1) * float(
+        horizontal_box_spacing
+    )
+    ys = np.arange(start_index, specific_options.vertical_boxes + 1) * float(
+        vertical_box_spacing
+    )
+
+    if specific_options.margin:
+        xs -= horizontal_box_spacing / 2
+        ys -= vertical_box_spacing / 2
+
+    coordinates = np.empty((len(xs) * len(ys), 2))
+    coordinates[:, 0] = np.repeat(xs, len(ys))
+    coordinates[:, 1] = np.tile(ys, len(xs))
+    xx, xy, yx, yy = rotation_matrix
+    new_xs = xx * coordinates[:, 0] + xy * coordinates[:, 1]
+    new_ys = yx * coordinates[:, 0] + yy * coordinates[:, 1]
+
+    # Pick the draw call once instead of re-checking the options in every cell
+    if drawing_options.text is not None:
+        text = drawing_options.text
+        # drawCentredString measures the string on every call; the text, font
+        # and size are constant across the grid, so measure once and center
+        # manually. Font and fill color are already set once in draw_watermarks,
+        # so the cells emit nothing but text-positioning operators.
+        half_width = (
+            watermark.stringWidth(
+                text, drawing_options.text_font, drawing_options.text_size
             )
+            / 2
+        )
+        draw_cell = lambda x_prime, y_prime: watermark.drawString(
+            x_prime - half_width, y_prime, text
+        )
+    elif drawing_options.image is not None:
+        # Wrap the image in a form XObject once; every cell then references it
+        # with a single Do operator instead of re-running reportlab's image
+        # embedding path for each of the H*V cells.
+        form_name = "grid_watermark_image"
+        watermark.beginForm(
+            form_name,
+            lowerx=-image_width / 2,
+            lowery=-image_height / 2,
+            upperx=image_width / 2,
+            uppery=image_height / 2,
+        )
+        draw_centered_image(
+            watermark, 0, 0, image_width, image_height, drawing_options.image
+        )
+        watermark.endForm()
+
+        def draw_cell(x_prime, y_prime):
+            watermark.saveState()
+            watermark.translate(x_prime, y_prime)
+            watermark.doForm(form_name)
+            watermark.restoreState()
+    else:
+        raise ValueError("No watermark to draw.")
+
+    for x_prime, y_prime in zip(new_xs, new_ys):
+        draw_cell(x_prime, y_prime)
+
+
+def resolve_font(drawing_options: DrawingOptions):
+    """
+    Resolve and register the font to draw the watermark text with.
+
+    Nothing here depends on the page or the input file, so this runs once per
+    batch instead of once per page. The resolved font is written back to
+    drawing_options.text_font.
+    """
+    if drawing_options.text is None or not is_chinese(str(drawing_options.text)):
+        return
+
+    # print("watermark is Chinese. {}".format(drawing_options.text_font))
+
+    # If the requested font is already registered there is nothing to
+    # discover, so skip the font list and fc-list work entirely
+    if drawing_options.text_font in pdfmetrics.getRegisteredFontNames():
+        return
+
+    zh_fonts = ['Microsoft YaHei']
+    if ('Windows' != _PLATFORM):
+        zh_fonts = get_all_zh_font()
+
+    if zh_fonts is not None and len(zh_fonts) > 0:
+        if drawing_options.text_font not in zh_fonts:
+            for f in zh_fonts:
+                if f.find('Hei') > 0:
+                    drawing_options.text_font = f
+                    break
+                else:
+                    drawing_options.text_font = zh_fonts[0]
+
+        # print(drawing_options.text_font)
+        register_font(drawing_options.text_font)
+    else:
+        print("Please install Chinese font.")
 
 
 def draw_watermarks(
-    file_name: str,
+    file,
     width: float,
     height: float,
     drawing_options: DrawingOptions,
     specific_options: Union[GridOptions, InsertOptions],
 ):
-    watermark = canvas.Canvas(file_name, pagesize=(width, height))
-
-    rotation_angle_rad = drawing_options.angle * pi / 180
-    rotation_matrix = np.array(
-        [
-            [cos(rotation_angle_rad), -sin(rotation_angle_rad)],
-            [sin(rotation_angle_rad), cos(rotation_angle_rad)],
-        ]
-    )
+    # file can be a path or any file-like object accepted by reportlab
+    watermark = canvas.Canvas(file, pagesize=(width, height))
 
-    if drawing_options.text is not None and is_chinese(str(drawing_options.text)):
-        # fonts = watermark.getAvailableFonts()
-        # print("watermark is Chinese. {}".format(drawing_options.text_font))
-
-        zh_fonts = list('Microsoft YaHei')
-        if ('Windows' != platform.system()):
-            zh_fonts = get_all_zh_font()
-
-        # print(platform.system())
-        if zh_fonts is not None and len(zh_fonts) > 0:
-            if drawing_options.text_font not in zh_fonts:
-                for f in zh_fonts:
-                    if f.find('Hei') > 0:
-                        drawing_options.text_font = f
-                        break
-                    else:
-                        drawing_options.text_font = zh_fonts[0]
-
-            # print(drawing_options.text_font)
-            pdfmetrics.registerFont(TTFont(drawing_options.text_font, font_manager.findfont(drawing_options.text_font)))
-        else:
-            print("Please install Chinese font.")
+    rotation_matrix = get_rotation_matrix(drawing_options.angle)
 
     watermark.setFillColor(drawing_options.text_color, alpha=drawing_options.opacity)
     watermark.setFont(drawing_options.text_font, drawing_options.text_size)
     watermark.rotate(drawing_options.angle)
 
-    if isinstance(specific_options, InsertOptions):
-        draw_insert_watermark(
-            watermark, drawing_options, specific_options, width, height, rotation_matrix
-        )
-
-    elif isinstance(specific_options, GridOptions):
-        draw_grid_watermark(
-            watermark, drawing_options, specific_options, width, height, rotation_matrix
-        )
-    else:
-        raise NotImplementedError("Unknown watermark type.")
+    specific_options.draw(
+        watermark, drawing_options, width, height, rotation_matrix
+    )
 
     watermark.save()
 
-def is_chinese(text: str):
-    """
-    Check whether the entire string contains Chinese
-    """
-    for ch in text:
-        if u'\u4e00' <= ch <= u'\u9fff':
-            return True
-    return False
+@lru_cache(maxsize=1)
+def get_font_manager():
+    # FontManager construction scans the system font directories and parses
+    # every ttf it finds; build it at most once and share it.
+    return font_manager.FontManager()
+
 
+@lru_cache(maxsize=1)
 def get_all_zh_font():
-    fm = font_manager.FontManager()
+    # Spawning fc-list is slow and the result never changes during a run.
+    fm = get_font_manager()
     ttf_fonts = set(f.name for f in fm.ttflist)
     output = subprocess.check_output('fc-list :lang=zh -f "%{family}\n"', shell=True)
     zh_fonts = set(f.split(',', 1)[0] for f in output.decode().split('\n'))
@@ -250,3 +329,19 @@ def get_all_zh_font():
     # for f in available:
     #     print(f)
     return available
+
+
+@lru_cache(maxsize=64)
+def _findfont(font_name: str):
+    return get_font_manager().findfont(font_name)
+
+
+_registered_fonts = set()
+
+
+def register_font(font_name: str):
+    # Parsing and registering the same TTF once per page adds up in batch
+    # runs; only do it the first time a font is seen.
+    if font_name not in _registered_fonts:
+        pdfmetrics.registerFont(TTFont(font_name, _findfont(font_name)))
+        _registered_fonts.add(font_name)
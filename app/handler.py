@@ -1,3 +1,7 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
 from typing import Union
 from app.options import (
     DrawingOptions,
@@ -5,48 +9,130 @@ from app.options import (
     GridOptions,
     InsertOptions,
 )
-import PyPDF4
-from tempfile import NamedTemporaryFile
+from pypdf import PdfReader, PdfWriter
 
-from app.draw import draw_watermarks
+from app.draw import draw_watermarks, resolve_font
 
 
-def add_watermark_to_pdf(
-    input: str,
-    output: str,
+def get_watermark_page(
+    watermark_cache: dict,
+    page_width: float,
+    page_height: float,
     drawing_options: DrawingOptions,
     specific_options: Union[GridOptions, InsertOptions],
 ):
-    pdf_to_transform = PyPDF4.PdfFileReader(input)
-    pdf_box = pdf_to_transform.pages[0].mediaBox
-    page_width = float(pdf_box.getWidth())
-    page_height = float(pdf_box.getHeight())
+    # The watermark only depends on the page size, so when processing a batch
+    # of files it is rendered once per unique size and reused for all others,
+    # skipping the reportlab canvas and font setup costs.
+    key = (page_width, page_height)
+    watermark_page = watermark_cache.get(key)
 
-    with NamedTemporaryFile() as temporary_file:
-        # The watermark is stored in a temporary pdf file
+    if watermark_page is None:
+        # The watermark is rendered into an in-memory pdf, skipping the disk
+        # round-trip a temporary file would cost
+        buffer = BytesIO()
         draw_watermarks(
-            temporary_file.name,
+            buffer,
             page_width,
             page_height,
             drawing_options,
             specific_options,
         )
+        buffer.seek(0)
+
+        watermark_pdf = PdfReader(buffer)
+        watermark_page = watermark_pdf.pages[0]
+        watermark_cache[key] = watermark_page
+
+    return watermark_page
+
+
+def add_watermark_to_pdf(
+    input: str,
+    output: str,
+    drawing_options: DrawingOptions,
+    specific_options: Union[GridOptions, InsertOptions],
+    watermark_cache: Union[None, dict] = None,
+):
+    if watermark_cache is None:
+        watermark_cache = {}
+
+    pdf_to_transform = PdfReader(input)
+    pdf_box = pdf_to_transform.pages[0].mediabox
+    page_width = float(pdf_box.width)
+    page_height = float(pdf_box.height)
 
-        watermark_pdf = PyPDF4.PdfFileReader(temporary_file.name)
-        pdf_writer = PyPDF4.PdfFileWriter()
+    watermark_page = get_watermark_page(
+        watermark_cache, page_width, page_height, drawing_options, specific_options
+    )
+    pdf_writer = PdfWriter()
 
-        for page in pdf_to_transform.pages:
-            page.mergePage(watermark_pdf.pages[0])
-            pdf_writer.addPage(page)
+    for page in pdf_to_transform.pages:
+        page.merge_page(watermark_page)
+        pdf_writer.add_page(page)
 
+    # The output may be the input itself (the default is to overwrite), so it
+    # is only opened once every page has been cloned into the writer
     with open(output, "wb") as f:
         pdf_writer.write(f)
 
+    pdf_to_transform.close()
+
+
+# Per-process watermark cache for the pool workers: each worker keeps the
+# pages it has rendered, so files of the same page size handled by the same
+# process reuse them just like the serial path does.
+_worker_watermark_cache = {}
+
+
+def process_one_file(
+    input_file: str,
+    output_file: str,
+    drawing_options: DrawingOptions,
+    specific_options: Union[GridOptions, InsertOptions],
+):
+    # Font registration is per-process state, so each worker resolves the font
+    # itself; the discovery and registration caches make repeat calls cheap.
+    resolve_font(drawing_options)
+    add_watermark_to_pdf(
+        input_file,
+        output_file,
+        drawing_options,
+        specific_options,
+        _worker_watermark_cache,
+    )
+
 
 def add_watermark_from_options(
     files_options: FilesOptions,
     drawing_options: DrawingOptions,
     specific_options: Union[GridOptions, InsertOptions],
 ):
-    for input_file, output_file in files_options:
-        add_watermark_to_pdf(input_file, output_file, drawing_options, specific_options)
+    input_files = files_options.input_files
+    output_files = files_options.output_files
+
+    if len(input_files) <= 1:
+        resolve_font(drawing_options)
+        watermark_cache = {}
+
+        for input_file, output_file in files_options:
+            add_watermark_to_pdf(
+                input_file,
+                output_file,
+                drawing_options,
+                specific_options,
+                watermark_cache,
+            )
+    else:
+        # Files are independent and the work is CPU-bound (reportlab rendering
+        # and pypdf merging), so spread a batch over all cores.
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(
+                executor.map(
+                    process_one_file,
+                    input_files,
+                    output_files,
+                    repeat(drawing_options),
+                    repeat(specific_options),
+                )
+            )
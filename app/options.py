@@ -17,6 +17,7 @@ class DrawingOptions:
         image_scale: float,
     ) -> None:
         self.image = None
+        self.image_path = None
         self.text = None
 
         potential_image_path = os.path.join(os.getcwd(), watermark)
@@ -24,6 +25,7 @@ class DrawingOptions:
             (".png", ".jpg", ".jpeg", ".PNG", ".JPG", ".JPEG")
         ) and os.path.isfile(potential_image_path):
             self.image = ImageReader(watermark)
+            self.image_path = watermark
         else:
             self.text = watermark
 
@@ -34,6 +36,19 @@ class DrawingOptions:
         self.text_size = text_size
         self.image_scale = image_scale
 
+    # ImageReader objects hold an open file and cannot be pickled, which is
+    # required to send the options to worker processes. Pickle the image path
+    # instead and reopen the image on the other side.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["image"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.image_path is not None:
+            self.image = ImageReader(self.image_path)
+
 
 class FilesOptions:
     def __init__(
@@ -110,6 +125,14 @@ class GridOptions:
         self.vertical_boxes = vertical_boxes
         self.margin = margin
 
+    def draw(self, watermark, drawing_options, width, height, rotation_matrix):
+        # imported here to avoid a circular import with app.draw
+        from app.draw import draw_grid_watermark
+
+        draw_grid_watermark(
+            watermark, drawing_options, self, width, height, rotation_matrix
+        )
+
 
 class Alignments(Enum):
     LEFT = "left"
@@ -135,3 +158,11 @@ class InsertOptions:
         self.y = y
         self.x = x
         self.horizontal_alignment = horizontal_alignment
+
+    def draw(self, watermark, drawing_options, width, height, rotation_matrix):
+        # imported here to avoid a circular import with app.draw
+        from app.draw import draw_insert_watermark
+
+        draw_insert_watermark(
+            watermark, drawing_options, self, width, height, rotation_matrix
+        )
@@ -1,8 +1,19 @@
+import re
 from typing import Tuple
 from reportlab.pdfgen import canvas
-import numpy as np
 from reportlab.lib.utils import ImageReader
 
+_CJK_RE = re.compile(u'[\u4e00-\u9fff]')
+
+
+def is_chinese(text: str):
+    """
+    Check whether the string contains Chinese
+    """
+    # A precompiled regex scans the string in C, much faster than a Python
+    # character loop for long watermark strings
+    return _CJK_RE.search(text) is not None
+
 
 def draw_centered_image(
     canvas: canvas.Canvas,
@@ -24,11 +35,15 @@ def draw_centered_image(
     )
 
 
-def change_base(x: float, y: float, rotation_matrix: np.ndarray) -> Tuple[float, float]:
-    # Since we rotated the original coordinates system, use the inverse of the rotation matrix
-    # (which is the transposed matrix) to get the coordinates we have to draw at
-    new_coordinates = np.transpose(rotation_matrix) @ np.array([[x], [y]])
-    return new_coordinates[0, 0], new_coordinates[1, 0]
+def change_base(
+    x: float, y: float, rotation_matrix: Tuple[float, float, float, float]
+) -> Tuple[float, float]:
+    # Since we rotated the original coordinates system, the matrix we receive is
+    # already the inverse (i.e. transposed) rotation matrix, flattened to
+    # (xx, xy, yx, yy) Python floats, which gives us the coordinates we have to
+    # draw at with four multiplies and no numpy involvement.
+    xx, xy, yx, yy = rotation_matrix
+    return xx * x + xy * y, yx * x + yy * y
 
 
 def fit_image(image_width, image_height, max_image_width, max_image_height, scale):